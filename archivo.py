@@ -1,139 +1,372 @@
+import argparse
+import bisect
+import hashlib
+import html
+import io
+import mmap
 import os
 import re
-from graphviz import Digraph
+import shelve
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Optional: batched reads through io_uring on Linux (pip install liburing)
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+# Optional: RE2 compiles to a DFA and scans in linear time without
+# backtracking (pip install google-re2)
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+def _compile(pattern, flags=0):
+    if re2 is not None:
+        try:
+            return re2.compile(pattern, flags)
+        except re2.error:
+            # RE2 rejects lookarounds; fall back to the backtracking engine
+            pass
+    return re.compile(pattern, flags)
+
+# Compile the patterns once at import time; re's internal cache is small and
+# can be evicted, so relying on it re-compiles the patterns on every call.
+# The patterns are byte patterns: the Julia sources are ASCII and scanning
+# bytes avoids both the decode of every file and the Unicode-aware matching
+# tables — only the small captured tokens get decoded.
+IMPORT_RE = _compile(rb"(?:import|using)\s+([\w\.]+)")
+
+# Single alternation covering every token the parser cares about, so the
+# content is scanned once instead of once per pattern. The assignment
+# expression is captured in a lookahead so that calls appearing on the
+# right-hand side are still seen by the "call" branch; the lookahead also
+# keeps this pattern on re even when RE2 is available.
+MASTER_RE = _compile(
+    rb"(?P<func>function\s+(?P<func_name>\w+)\s*\((?P<params>[^)]*)\))"
+    rb"|(?P<end>^[ \t]*end\b)"
+    # do-blocks open at the end of a call line rather than at line start;
+    # consuming the rest of the line swallows the block's argument names
+    rb"|(?P<block>^[ \t]*(?:if|for|while|begin|let|try|quote|struct|mutable[ \t]+struct|module|baremodule|macro)\b|\bdo\b[^\n]*$)"
+    # The return expression is captured in a lookahead (like "out" below)
+    # so calls inside it are still seen by the "call" branch
+    rb"|(?P<ret>^[ \t]*return[ \t]+(?=(?P<ret_expr>[^\n]+)))"
+    rb"|(?P<gdata>gdata\.(?P<gdata_name>\w+)\s*=)"
+    rb"|(?P<out>(?P<out_name>\w+)\s*=\s*(?=(?P<out_expr>[\w\.]+)))"
+    rb"|(?P<call>(?P<call_name>\w+)\()"
+    rb"|(?P<var>(?P<var_name>\w+)\s*::?\s*\w*)",
+    re.MULTILINE,
+)
+
+# The scan loop dispatches on Match.lastindex — the outer alternative group
+# closes last, so it identifies the matched branch with a single attribute
+# read instead of up to six named-group lookups per token.
+_TOK_FUNC = MASTER_RE.groupindex["func"]
+_TOK_END = MASTER_RE.groupindex["end"]
+_TOK_BLOCK = MASTER_RE.groupindex["block"]
+_TOK_RET = MASTER_RE.groupindex["ret"]
+_RET_EXPR = MASTER_RE.groupindex["ret_expr"]
+_TOK_GDATA = MASTER_RE.groupindex["gdata"]
+_TOK_OUT = MASTER_RE.groupindex["out"]
+_TOK_CALL = MASTER_RE.groupindex["call"]
+_TOK_VAR = MASTER_RE.groupindex["var"]
+_FUNC_NAME = MASTER_RE.groupindex["func_name"]
+_PARAMS = MASTER_RE.groupindex["params"]
+_GDATA_NAME = MASTER_RE.groupindex["gdata_name"]
+_OUT_NAME = MASTER_RE.groupindex["out_name"]
+_OUT_EXPR = MASTER_RE.groupindex["out_expr"]
+_CALL_NAME = MASTER_RE.groupindex["call_name"]
+_VAR_NAME = MASTER_RE.groupindex["var_name"]
 
 def combine_files(file_directory):
     files_data = {}
-    for filename in os.listdir(file_directory):
-        if filename.endswith(".jl"):
-            file_path = os.path.join(file_directory, filename)
-            with open(file_path, 'r') as file:
-                file_content = file.read()
-                files_data[filename] = {"content": file_content, "imports": extract_imports(file_content)}
+    # scandir returns DirEntry objects with a cached is_file(), avoiding an
+    # extra stat per directory entry
+    with os.scandir(file_directory) as it:
+        entries = [entry for entry in it if entry.name.endswith(".jl") and entry.is_file()]
+    if not entries:
+        return files_data
+    if liburing is not None:
+        results = _read_files_uring(entries)
+    else:
+        # Reads block on disk latency and release the GIL, so fan them out
+        # over a thread pool instead of paying each file's latency in sequence
+        with ThreadPoolExecutor(max_workers=min(32, len(entries))) as executor:
+            results = list(executor.map(_read_file, entries))
+    # Both read paths preserve the order of entries, so zip to pick up each
+    # file's stat for the parse cache key
+    for entry, (filename, file_content) in zip(entries, results):
+        stat = entry.stat()
+        files_data[filename] = {
+            "content": file_content,
+            "imports": extract_imports(file_content),
+            "cache_key": f"{entry.path}|{stat.st_mtime_ns}|{stat.st_size}",
+        }
     return files_data
 
+def _read_file(entry):
+    # Map the file instead of read()ing it: the byte patterns scan the page
+    # cache directly, with no userspace copy of the content
+    with open(entry.path, 'rb') as file:
+        if entry.stat().st_size == 0:
+            return entry.name, b""
+        return entry.name, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _read_files_uring(entries):
+    # Submit every read as one io_uring batch: a couple of syscalls for the
+    # whole directory instead of a blocking read per file
+    ring = liburing.io_uring()
+    liburing.io_uring_queue_init(len(entries), ring, 0)
+    fds = []
+    buffers = []
+    try:
+        for index, entry in enumerate(entries):
+            fd = os.open(entry.path, os.O_RDONLY)
+            buf = bytearray(entry.stat().st_size)
+            fds.append(fd)
+            buffers.append(buf)
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_read(sqe, fd, buf, len(buf), 0)
+            sqe.user_data = index
+        liburing.io_uring_submit(ring)
+        cqe = liburing.io_uring_cqe()
+        short_reads = []
+        for _ in entries:
+            liburing.io_uring_wait_cqe(ring, cqe)
+            liburing.trap_error(cqe.res)
+            index = cqe.user_data
+            # A non-negative result can still be a partial read; the buffer
+            # is pre-sized, so anything short would leave a NUL-padded tail
+            if cqe.res != len(buffers[index]):
+                short_reads.append(index)
+            liburing.io_uring_cqe_seen(ring, cqe)
+        for index in short_reads:
+            with open(entries[index].path, 'rb') as file:
+                buffers[index] = file.read()
+    finally:
+        for fd in fds:
+            os.close(fd)
+        liburing.io_uring_queue_exit(ring)
+    return [(entry.name, bytes(buf)) for entry, buf in zip(entries, buffers)]
+
+_imports_cache = {}
+
 def extract_imports(content):
-    # Regular expression to find import/using statements
-    import_pattern = re.compile(r"(?:import|using)\s+([\w\.]+)")
-    return import_pattern.findall(content)
+    # Find import/using statements; memoized so unchanged content re-seen
+    # across calls skips the regex scan entirely. mmap buffers hash by
+    # identity, so the memo is keyed on a fast content digest instead.
+    digest = hashlib.blake2b(content, digest_size=16).digest()
+    imports = _imports_cache.get(digest)
+    if imports is None:
+        imports = [module.decode() for module in IMPORT_RE.findall(content)]
+        _imports_cache[digest] = imports
+    return imports
 
-def parse_julia_content(content):
-    function_pattern = re.compile(r"function\s+(\w+)\s*\(([^)]*)\)")
-    output_pattern = re.compile(r"(\w+)\s*=\s*([\w\.]+)")
-    variable_pattern = re.compile(r"(\w+)\s*::?\s*\w*")
-    call_pattern = re.compile(r"(\w+)\(")
-    gdata_pattern = re.compile(r"gdata\.(\w+)\s*=\s*(.+)")
+# Parse results survive process restarts here, keyed on (path, mtime, size)
+CACHE_PATH = '.diagram-cache'
 
+# Folded into every cache key; bump whenever the scanner or the shape of the
+# cached partial dicts changes, so entries written by an older parser are
+# never served against files whose mtimes haven't moved
+_PARSE_SCHEMA = 2
+
+def parse_julia_content(files_data):
     functions = {}
-    current_func = None
+    # Parse each file separately so every function is stamped with the file
+    # it was defined in; per-file results are cached on the stat key so
+    # unchanged files skip the scan entirely on incremental runs
+    with shelve.open(CACHE_PATH) as cache:
+        for filename, data in files_data.items():
+            key = data.get("cache_key")
+            if key is not None:
+                key = f"v{_PARSE_SCHEMA}|{key}"
+            partial = cache.get(key) if key is not None else None
+            if partial is None:
+                partial = _parse_file(data["content"], filename)
+                if key is not None:
+                    cache[key] = partial
+            functions.update(partial)
 
-    # Find all function definitions
-    for match in function_pattern.finditer(content):
-        func_name = match.group(1)
-        params = match.group(2).split(',')
-        params = [param.strip() for param in params if param.strip()]
-        functions[func_name] = {
-            "inputs": params, 
-            "outputs": [], 
-            "variables": [], 
-            "calls": [], 
-            "gdata": []
-        }
-        current_func = func_name
-
-    # Find all output assignments
-    for match in output_pattern.finditer(content):
-        var_name = match.group(1)
-        expr = match.group(2)
-        
-        # Associate outputs with functions
-        for func in functions.values():
-            if var_name in func["inputs"]:
-                func["outputs"].append(expr)
+    # Calls are collected before all functions are known (including calls
+    # across files), so filter them against the complete set afterwards.
+    # The immutable snapshot keeps membership tests off the dict being
+    # iterated and would let this pass be parallelized later.
+    func_names = frozenset(functions)
+    for func_name, details in functions.items():
+        details["calls"] = {called_func for called_func in details["calls"]
+                            if called_func in func_names and called_func != func_name}
 
-    # Find all variable declarations and assignments
-    for match in variable_pattern.finditer(content):
-        var_name = match.group(1)
-        if current_func:
-            functions[current_func]["variables"].append(var_name)
+    return functions
 
-    # Find all function calls and gdata assignments
-    for func_name, details in functions.items():
-        func_start = content.find(f"function {func_name}")
-        func_end = content.find("end", func_start)
-        func_code = content[func_start:func_end]
+def _parse_file(content, filename):
+    functions = {}
+    current_func = None
+    # Depth of nested end-terminated blocks inside the current function, so
+    # an inner if/for/begin "end" does not close the function early
+    depth = 0
+    assignments = []
+    # Position map: finditer yields definitions in order, so each function's
+    # region runs from its start to the next function's start
+    func_starts = []
+    funcs_by_pos = []
 
-        # Function calls
-        for call_match in call_pattern.finditer(func_code):
-            called_func = call_match.group(1)
-            if called_func in functions and called_func != func_name:
-                details["calls"].append(called_func)
+    # Single pass over the content, dispatching on which alternative matched
+    for match in MASTER_RE.finditer(content):
+        token = match.lastindex
+        if token == _TOK_FUNC:
+            func_name = match.group(_FUNC_NAME).decode()
+            params = [param.strip().decode() for param in match.group(_PARAMS).split(b',') if param.strip()]
+            functions[func_name] = {
+                "file": filename,
+                "inputs": params,
+                "outputs": [],
+                # dict keys give O(1) dedup while keeping insertion order
+                "variables": {},
+                "calls": set(),
+                "gdata": set()
+            }
+            func_starts.append(match.start())
+            funcs_by_pos.append(func_name)
+            current_func = func_name
+            depth = 1
+        elif token == _TOK_END:
+            if current_func:
+                depth -= 1
+                if depth == 0:
+                    current_func = None
+        elif token == _TOK_BLOCK:
+            if current_func:
+                depth += 1
+        elif token == _TOK_RET:
+            if current_func:
+                functions[current_func]["outputs"].append(match.group(_RET_EXPR).decode().strip())
+        elif token == _TOK_GDATA:
+            if current_func:
+                functions[current_func]["gdata"].add(match.group(_GDATA_NAME).decode())
+        elif token == _TOK_OUT:
+            assignments.append((match.start(), match.group(_OUT_NAME).decode(), match.group(_OUT_EXPR).decode()))
+        elif token == _TOK_CALL:
+            if current_func:
+                functions[current_func]["calls"].add(match.group(_CALL_NAME).decode())
+        elif token == _TOK_VAR:
+            if current_func:
+                functions[current_func]["variables"][match.group(_VAR_NAME).decode()] = None
 
-        # gdata assignments
-        for gdata_match in gdata_pattern.finditer(func_code):
-            gdata_var = gdata_match.group(1)
-            details["gdata"].append(gdata_var)
+    # Associate assignments of function inputs with outputs, locating the
+    # enclosing function through the position map instead of scanning every
+    # function per assignment
+    for pos, var_name, expr in assignments:
+        idx = bisect.bisect_right(func_starts, pos) - 1
+        if idx >= 0:
+            func = functions[funcs_by_pos[idx]]
+            if var_name in func["inputs"]:
+                func["outputs"].append(expr)
 
     return functions
 
-from graphviz import Digraph
+def _esc(name):
+    # Quote a DOT identifier
+    return '"' + name.replace('"', '\\"') + '"'
 
-def create_class_diagram(functions, files_data):
-    dot = Digraph()
+def _or_none(values):
+    # Escaped for the HTML-like label: Julia source is full of <, > and &
+    # (comparisons, short-circuit operators, Vector{<:Real} params), any of
+    # which would make Graphviz reject the label
+    return html.escape(", ".join(values)) or "None"
+
+# One template instantiated per node; %-formatting a fixed template beats
+# re-building the f-string row by row in the emission loop
+_LABEL_TMPL = (
+    '<<table border="0" cellborder="1" cellspacing="0" cellpadding="4" width="200">'
+    '<tr><td><b>File</b></td><td>%s</td></tr>'
+    '<tr><td><b>Imports</b></td><td>%s</td></tr>'
+    '<tr><td><b>Function</b></td><td>%s</td></tr>'
+    '<tr><td><b>Inputs</b></td><td>%s</td></tr>'
+    '<tr><td><b>Outputs</b></td><td>%s</td></tr>'
+    '<tr><td><b>Global Data</b></td><td>%s</td></tr>'
+    '<tr><td><b>Variables</b></td><td>%s</td></tr>'
+    '</table>>')
+
+def create_class_diagram(functions, files_data, engine='dot'):
+    # Emit DOT text directly instead of accumulating graphviz Digraph
+    # objects that get stringified again at render time
+    out = io.StringIO()
+    write = out.write
+    write('digraph {\n')
 
     # Set global attributes for better readability
-    dot.attr(size='15,15', ratio='auto', dpi='300', fontname='Arial')
-    dot.attr(nodesep='1', ranksep='1')
-    dot.attr(fontsize='10')
+    write('\tsize="15,15" ratio=auto dpi=300 fontname=Arial\n')
+    write('\tnodesep=1 ranksep=1\n')
+    write('\tfontsize=10\n')
+    if engine == 'sfdp':
+        # Keep the force-directed layout readable on big graphs
+        write('\toverlap=prism splines=true\n')
 
     # Add nodes for each function
     for func_name, details in functions.items():
-        # Find the file containing the function
-        file_name = next((file for file, data in files_data.items() if func_name in data["content"]), None)
+        # The parser stamped each function with its defining file
+        file_name = details["file"]
         imports = files_data[file_name]["imports"] if file_name else []
 
-        # Create a table structure to organize the information within the node
-        label = f"""<
-        <table border="0" cellborder="1" cellspacing="0" cellpadding="4" width="200">
-            <tr><td><b>File</b></td><td>{file_name}</td></tr>
-            <tr><td><b>Imports</b></td><td>{', '.join(imports) if imports else 'None'}</td></tr>
-            <tr><td><b>Function</b></td><td>{func_name}</td></tr>
-            <tr><td><b>Inputs</b></td><td>{', '.join(details["inputs"]) if details["inputs"] else 'None'}</td></tr>
-            <tr><td><b>Outputs</b></td><td>{', '.join(details["outputs"]) if details["outputs"] else 'None'}</td></tr>
-            <tr><td><b>Global Data</b></td><td>{', '.join(details["gdata"]) if details["gdata"] else 'None'}</td></tr>
-            <tr><td><b>Variables</b></td><td>{', '.join(details["variables"]) if details["variables"] else 'None'}</td></tr>
-        </table>>"""
+        # Fill the shared table template for this node
+        label = _LABEL_TMPL % (
+            html.escape(file_name),
+            _or_none(imports),
+            html.escape(func_name),
+            _or_none(details["inputs"]),
+            _or_none(details["outputs"]),
+            _or_none(sorted(details["gdata"])),
+            _or_none(details["variables"]),
+        )
 
         # Add nodes without fixedsize, letting them grow vertically
-        dot.node(func_name, label=label, shape='rect', style='filled', fillcolor='lightgreen',
-                 fontsize='10', width='2.0')
+        write(f'\t{_esc(func_name)} [label={label} shape=rect style=filled '
+              f'fillcolor=lightgreen fontsize=10 width=2.0]\n')
 
-    # Use a set to track unique edges
-    edges = set()
-
-    # Add edges based on function calls
+    # Add edges based on function calls; "calls" is already a unique set,
+    # sorted so the emitted graph is deterministic
     for func_name, details in functions.items():
-        for called_func in details["calls"]:
-            # Add the edge only if it doesn't already exist
-            edge = (func_name, called_func)
-            if edge not in edges:
-                dot.edge(func_name, called_func, color='black', penwidth='2')  # Thicker edges for better visibility
-                edges.add(edge)
+        for called_func in sorted(details["calls"]):
+            write(f'\t{_esc(func_name)} -> {_esc(called_func)} [color=black penwidth=2]\n')  # Thicker edges for better visibility
 
-    return dot
+    write('}\n')
+    return out.getvalue()
 
 
 
 
 
+def build_graph(directory_path):
+    files_data = combine_files(directory_path)
+    functions = parse_julia_content(files_data)
+    # dot's hierarchical layout is quadratic or worse on dense call graphs;
+    # sfdp stays near-linear, so switch over once the graph gets big
+    engine = 'sfdp' if len(functions) > 200 else 'dot'
+    return create_class_diagram(functions, files_data, engine=engine), engine
+
+def emit(dot_source, dot_only=False, engine='dot'):
+    if dot_only:
+        # Writing the DOT source skips the Graphviz layout/render step,
+        # which dominates wall clock when iterating on the parser
+        with open('class_diagram.dot', 'w') as file:
+            file.write(dot_source)
+        print("Fuente DOT generada como 'class_diagram.dot'.")
+    else:
+        # Pipe the DOT straight into the layout engine, no temp file
+        subprocess.run([engine, '-Tpdf', '-o', 'class_diagram.pdf'],
+                       input=dot_source.encode(), check=True)  # Use PDF format for better quality
+        print("Diagrama de clases generado como 'class_diagram.pdf'.")
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate a class diagram from Julia source files")
+    parser.add_argument('--dot-only', action='store_true',
+                        help="write the DOT source instead of rendering the PDF")
+    args = parser.parse_args()
     directory_path = 'archivos'  # Replace with the path to your directory of Julia files
-    files_data = combine_files(directory_path)
-    combined_content = "\n".join([data["content"] for data in files_data.values()])
-    functions = parse_julia_content(combined_content)
-    dot = create_class_diagram(functions, files_data)
-    dot.render('class_diagram', format='pdf', cleanup=True)  # Use PDF format for better quality
-    print("Diagrama de clases generado como 'class_diagram.pdf'.")
+    dot_source, engine = build_graph(directory_path)
+    emit(dot_source, dot_only=args.dot_only, engine=engine)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file